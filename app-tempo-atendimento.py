@@ -1,4 +1,9 @@
+import hashlib
+import os
+from pathlib import Path
+
 import streamlit as st
+import numpy as np
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
@@ -17,6 +22,24 @@ def format_brl(numero, casas_decimais=0):
         return str(numero)
 
 
+# Aplica o padrão brasileiro na exibição de um DataFrame, mantendo os dados numéricos
+
+
+def style_brl(df, casas_decimais=0, subset=None):
+    return df.style.format(
+        precision=casas_decimais, thousands=".", decimal=",", subset=subset)
+
+
+# Cria a coluna DATA (AAAA-MM) formatando apenas as combinações distintas de ANO/MES
+
+
+def coluna_data(df):
+    codigo = df["ANO"].astype("int32") * 100 + df["MES"].astype("int32")
+    codes, periodos = pd.factorize(codigo, sort=True)
+    rotulos = [f"{p // 100}-{p % 100:02d}" for p in periodos]
+    return pd.Categorical.from_codes(codes, categories=rotulos)
+
+
 # Configuração da página
 st.set_page_config(
     page_title="Dashboard de Atendimento por Setor",
@@ -24,74 +47,302 @@ st.set_page_config(
     layout="wide"
 )
 
-# Função para converter tempo médio de espera para minutos
+# Planilhas de origem
+
+ARQUIVO_TEMPO = "Tempo_Atendimentos.xlsx"
+ARQUIVO_ATENDIMENTOS = "Atendimentos.xlsx"
+
+# Cache em disco (parquet) das planilhas já processadas
+
+CACHE_DIR = Path(".cache")
+# Incrementar sempre que o processamento das planilhas mudar (tipos, colunas...)
+CACHE_VERSION = 5
+
+
+def cached_excel(file_path, loader):
+    """Retorna o DataFrame do cache parquet, gerando-o com o loader se necessário"""
+    path = Path(file_path)
+
+    # Chave: conteúdo do arquivo + nome + data de modificação
+    with open(path, "rb") as f:
+        chave = hashlib.blake2b(f.read(), digest_size=8)
+    chave.update(
+        f"{path.name}:{path.stat().st_mtime_ns}:{CACHE_VERSION}".encode())
+    cache_file = CACHE_DIR / f"{path.stem}-{chave.hexdigest()}.parquet"
 
+    if cache_file.exists():
+        try:
+            return pd.read_parquet(cache_file)
+        except Exception:
+            pass  # Cache corrompido: relê o Excel e regrava o arquivo
 
-def convert_time_to_minutes(time_str):
-    """Converte string de tempo HH:MM para minutos"""
+    df = loader(file_path)
+    # Grava num arquivo temporário e troca de uma vez, para nunca deixar
+    # um parquet pela metade se o processo for interrompido
+    tmp_file = cache_file.with_suffix(f".{os.getpid()}.tmp")
     try:
-        # Lida com formatos como '0:06' ou '00:06'
-        if isinstance(time_str, str):
-            parts = time_str.split(":")
-            if len(parts) == 2:
-                hours = int(parts[0])
-                minutes = int(parts[1])
-                return hours * 60 + minutes
-            else:
-                return time_str.minute  # Formato inválido
-        return time_str.minute  # Não é string
-    except ValueError:
-        return 0  # Erro de conversão
+        CACHE_DIR.mkdir(exist_ok=True)
+        df.to_parquet(tmp_file, compression="zstd", index=False)
+        os.replace(tmp_file, cache_file)
+    except (OSError, ImportError):
+        tmp_file.unlink(missing_ok=True)  # Sem cache em disco, segue com os dados do Excel
+    return df
 
 
 # Carregar dados do Excel
 
 
-@st.cache_data
-def load_data_from_excel(file_path):
-    xls = pd.ExcelFile(file_path)
-    all_sheets_df = []
-    for sheet_name in xls.sheet_names:
-        df_sheet = pd.read_excel(xls, sheet_name=sheet_name)
-        all_sheets_df.append(df_sheet)
+def ler_abas(file_path, dtype):
+    """Lê todas as abas da planilha com o leitor calamine (mais rápido que o openpyxl)"""
+    # Uma única leitura de todas as abas: ler cada aba em uma thread reabre e
+    # reprocessa a planilha inteira e ficou mais lento nessas planilhas
+    return pd.read_excel(file_path, sheet_name=None, engine="calamine", dtype=dtype)
 
-    df = pd.concat(all_sheets_df, ignore_index=True)
 
-    # Converter tempo médio de espera para minutos
-    df["TEMPO_MINUTOS"] = df["TEMPO_MEDIO_ESPERA"].apply(
-        convert_time_to_minutes)
+def juntar_abas(frames):
+    """Empilha as abas coluna a coluna, sem reconstruir os blocos do pd.concat"""
+    frames = list(frames)
+    if not frames:
+        return pd.DataFrame()
+
+    # Só vale quando todas as abas têm as mesmas colunas e tipos
+    referencia = frames[0].dtypes
+    if any(not f.dtypes.equals(referencia) for f in frames[1:]):
+        return pd.concat(frames, ignore_index=True)
+
+    colunas = {}
+    for col, dtype in referencia.items():
+        if isinstance(dtype, np.dtype):
+            # Uma única alocação com o tamanho final da coluna
+            colunas[col] = np.concatenate([f[col].to_numpy() for f in frames])
+        else:
+            colunas[col] = pd.concat(
+                [f[col] for f in frames], ignore_index=True)
+    return pd.DataFrame(colunas, copy=False)
+
+
+def read_tempo_excel(file_path):
+    sheets = ler_abas(
+        file_path,
+        dtype={"SETOR": "string", "ANO": "int16",
+               "MES": "int8", "QUANTIDADE": "int32"}
+    )
+
+    df = juntar_abas(sheets.values())
+    df["SETOR"] = df["SETOR"].astype("category")
+    df["DATA"] = coluna_data(df)
+
+    # Texto em Arrow: evita a coluna de objetos (datetime.time) na conversão
+    # feita pelo Streamlit a cada exibição
+    df["TEMPO_MEDIO_ESPERA"] = df["TEMPO_MEDIO_ESPERA"].astype("string[pyarrow]")
+
+    # Converter tempo médio de espera (HH:MM ou HH:MM:SS) para minutos
+    partes = df["TEMPO_MEDIO_ESPERA"].str.extract(r"^(\d+):(\d+)")
+    horas = pd.to_numeric(partes[0], errors="coerce").fillna(0)
+    minutos = pd.to_numeric(partes[1], errors="coerce").fillna(0)
+    df["TEMPO_MINUTOS"] = (horas * 60 + minutos).astype("int32")
     return df
 
+
+@st.cache_data
+def load_data_from_excel(file_path):
+    return cached_excel(file_path, read_tempo_excel)
+
 # Carregar dados de atendimentos
 
 
+def read_atendimentos_excel(file_path):
+    # MES e ANO têm células vazias, então só são convertidos após o dropna
+    sheets = ler_abas(file_path, dtype={"SETOR": "string", "TIPO": "string"})
+    df_list = []
+
+    for df in sheets.values():
+        # Limpeza e tipos de dados
+        df = df.dropna(subset=['MES', 'ANO', 'TIPO'])
+        df['MES'] = df['MES'].astype('int8')
+        df['ANO'] = df['ANO'].astype('int16')
+        df['QTDE'] = pd.to_numeric(
+            df['QTDE'], errors='coerce').fillna(0).astype('int32')
+
+        df_list.append(df)
+
+    if df_list:
+        df = juntar_abas(df_list)
+        # Colunas de baixa cardinalidade como categoria (filtros e groupby mais rápidos)
+        for col in ("SETOR", "TIPO"):
+            df[col] = df[col].astype("category")
+        df["DATA"] = coluna_data(df)
+        return df
+    else:
+        return pd.DataFrame()
+
+
 @st.cache_data
 def load_atendimentos_data(file_path):
     """Carrega dados de todas as abas da planilha de atendimentos"""
     try:
-        xls = pd.ExcelFile(file_path)
-        df_list = []
+        return cached_excel(file_path, read_atendimentos_excel)
 
-        for sheet_name in xls.sheet_names:
-            df = pd.read_excel(xls, sheet_name=sheet_name)
+    except Exception as e:
+        st.error(f"Erro ao carregar dados de atendimentos: {e}")
+        return pd.DataFrame()
 
-            # Limpeza e tipos de dados
-            df = df.dropna(subset=['MES', 'ANO', 'TIPO'])
-            df['MES'] = df['MES'].astype(int)
-            df['ANO'] = df['ANO'].astype(int)
-            df['QTDE'] = pd.to_numeric(
-                df['QTDE'], errors='coerce').fillna(0).astype(int)
 
-            df_list.append(df)
+# DataFrames base guardados na sessão: o st.cache_data devolve uma cópia a cada
+# chamada, então cada rerun faria uma nova cópia dos dados completos
 
-        if df_list:
-            return pd.concat(df_list, ignore_index=True)
-        else:
-            return pd.DataFrame()
 
-    except Exception as e:
-        st.error(f"Erro ao carregar dados de atendimentos: {e}")
-        return pd.DataFrame()
+def base_tempo():
+    if "base_tempo" not in st.session_state:
+        st.session_state.base_tempo = load_data_from_excel(ARQUIVO_TEMPO)
+    return st.session_state.base_tempo
+
+
+def base_atendimentos():
+    if "base_atendimentos" not in st.session_state:
+        st.session_state.base_atendimentos = load_atendimentos_data(
+            ARQUIVO_ATENDIMENTOS)
+    return st.session_state.base_atendimentos
+
+
+# Máximo de barras nos gráficos por setor (ficam os maiores valores)
+LIMITE_BARRAS = 20
+
+
+# Seleciona as linhas que atendem aos filtros ("Todos" não filtra a coluna)
+
+
+def aplicar_filtros(df, **filtros):
+    # Uma única máscara booleana, uma única seleção
+    mask = np.ones(len(df), dtype=bool)
+    for coluna, valor in filtros.items():
+        if valor != "Todos":
+            mask &= df[coluna].values == valor
+    return df.loc[mask]
+
+
+# Agregações em cache: a chave é só a tupla de filtros, não o DataFrame
+
+
+@st.cache_data(show_spinner=False)
+def agregar_tempo(setor, ano, mes):
+    """Agregações da aba de tempo por setor, por mês/setor e por mês"""
+    df_filtrado = aplicar_filtros(
+        base_tempo(), SETOR=setor, ANO=ano, MES=mes)
+
+    g_setor = df_filtrado.groupby("SETOR", sort=False, observed=True).agg(
+        QUANTIDADE=("QUANTIDADE", "sum"),
+        TEMPO_MINUTOS=("TEMPO_MINUTOS", "mean"),
+        QTD_MEAN=("QUANTIDADE", "mean"),
+        QTD_MAX=("QUANTIDADE", "max"),
+        T_MAX=("TEMPO_MINUTOS", "max"),
+        T_MIN=("TEMPO_MINUTOS", "min")
+    )
+    g_data_setor = df_filtrado.groupby(["DATA", "SETOR"], observed=True).agg(
+        QUANTIDADE=("QUANTIDADE", "sum"),
+        TEMPO_MINUTOS=("TEMPO_MINUTOS", "mean")
+    ).reset_index()
+    # ANO como texto no índice para não ser exibido com separador de milhar
+    g_mes = df_filtrado.groupby(
+        [df_filtrado["ANO"].astype(str), "MES"], observed=True).agg(
+        QUANTIDADE=("QUANTIDADE", "sum"),
+        QTD_MEAN=("QUANTIDADE", "mean"),
+        TEMPO_MINUTOS=("TEMPO_MINUTOS", "mean")
+    )
+    return g_setor, g_data_setor, g_mes
+
+
+@st.cache_data(show_spinner=False)
+def agregar_atendimentos(setor, tipo, ano, mes):
+    """Agregações da aba de atendimentos por setor, tipo, mês e combinações"""
+    df_atend_filtrado = aplicar_filtros(
+        base_atendimentos(), SETOR=setor, TIPO=tipo, ANO=ano, MES=mes)
+
+    g_setor_atend = df_atend_filtrado.groupby("SETOR", observed=True)[
+        "QTDE"].agg(["sum", "mean", "max", "min"])
+    g_tipo_atend = df_atend_filtrado.groupby("TIPO", observed=True)[
+        "QTDE"].agg(["sum", "mean", "max", "min"])
+    g_setor_mes = df_atend_filtrado.groupby(
+        ["SETOR", "ANO", "MES"], as_index=False, observed=True)["QTDE"].sum()
+    g_data_tipo = df_atend_filtrado.groupby(
+        ["DATA", "TIPO"], as_index=False, observed=True)["QTDE"].sum()
+    g_setor_tipo = df_atend_filtrado.groupby(
+        ["SETOR", "TIPO"], as_index=False, observed=True)["QTDE"].sum()
+    return g_setor_atend, g_tipo_atend, g_setor_mes, g_data_tipo, g_setor_tipo
+
+
+@st.cache_data(show_spinner=False)
+def montar_heatmap(setor, tipo, ano, mes):
+    """Matriz SETOR x MES com a soma de atendimentos"""
+    df_atend_filtrado = aplicar_filtros(
+        base_atendimentos(), SETOR=setor, TIPO=tipo, ANO=ano, MES=mes)
+
+    # Soma direta nos códigos da categoria SETOR e no mês (1-12), sem pivot_table
+    setores = df_atend_filtrado["SETOR"].cat.categories
+    codes = df_atend_filtrado["SETOR"].cat.codes.to_numpy()
+    meses = df_atend_filtrado["MES"].to_numpy().astype(np.intp) - 1
+    qtde = df_atend_filtrado["QTDE"].to_numpy()
+
+    # Descarta SETOR vazio (código -1) e mês fora de 1-12, como o pivot_table fazia
+    ok = (codes >= 0) & (meses >= 0) & (meses < 12)
+    codes, meses, qtde = codes[ok], meses[ok], qtde[ok]
+
+    matriz = np.zeros((len(setores), 12), dtype=np.int64)
+    np.add.at(matriz, (codes, meses), qtde)
+
+    # Mantém apenas setores e meses presentes no filtro
+    linhas = np.bincount(codes, minlength=len(setores)) > 0
+    colunas = np.bincount(meses, minlength=12) > 0
+    return pd.DataFrame(
+        matriz[np.ix_(linhas, colunas)],
+        index=pd.Index(setores[linhas], name="SETOR"),
+        columns=pd.Index(np.arange(1, 13)[colunas], name="MES")
+    )
+
+
+# Tabelas de dados detalhados
+
+# Máximo de linhas enviadas ao navegador; o restante fica no CSV completo
+LIMITE_LINHAS = 500
+
+
+def tabela_tempo(df_filtrado):
+    """Monta a tabela de dados detalhados da aba de tempo"""
+    df_display = df_filtrado.copy()
+    minutos = df_display["TEMPO_MINUTOS"]
+    df_display["TEMPO_MEDIO_ESPERA_MIN"] = (
+        (minutos // 60).astype("string[pyarrow]").str.zfill(2) + ":" +
+        (minutos % 60).astype("string[pyarrow]").str.zfill(2))
+
+    # Selecionar colunas para exibição
+    colunas_display = ["CODIGO", "SETOR", "ANO", "MES",
+                       "QUANTIDADE", "TEMPO_MEDIO_ESPERA", "TEMPO_MEDIO_ESPERA_MIN"]
+    df_display = df_display[colunas_display]
+    df_display["ANO"] = df_display["ANO"].astype("string[pyarrow]")
+    return df_display
+
+
+def tabela_atendimentos(df_atend_filtrado):
+    """Monta a tabela de dados detalhados da aba de atendimentos"""
+    df_display_atend = df_atend_filtrado.copy()
+    df_display_atend["ANO"] = df_display_atend["ANO"].astype("string[pyarrow]")
+    return df_display_atend
+
+
+@st.cache_data(show_spinner=False)
+def csv_tempo(setor, ano, mes):
+    """CSV completo dos dados detalhados da aba de tempo"""
+    df_filtrado = aplicar_filtros(
+        base_tempo(), SETOR=setor, ANO=ano, MES=mes)
+    return tabela_tempo(df_filtrado).to_csv(index=False).encode("utf-8")
+
+
+@st.cache_data(show_spinner=False)
+def csv_atendimentos(setor, tipo, ano, mes):
+    """CSV completo dos dados detalhados da aba de atendimentos"""
+    df_atend_filtrado = aplicar_filtros(
+        base_atendimentos(), SETOR=setor, TIPO=tipo, ANO=ano, MES=mes)
+    return tabela_atendimentos(df_atend_filtrado).to_csv(index=False).encode("utf-8")
 
 
 # Título principal
@@ -106,7 +357,7 @@ tab1, tab2 = st.tabs(
 with tab1:
     # Carregar dados de tempo
     try:
-        df = load_data_from_excel("Tempo_Atendimentos.xlsx")
+        df = base_tempo()
 
         # Sidebar para filtros
         st.sidebar.header("🔍 Filtros - Tempo de Atendimento")
@@ -127,224 +378,197 @@ with tab1:
             "Selecione o Mês:", meses_disponiveis, key="mes_tempo")
 
         # Aplicar filtros
-        df_filtrado = df.copy()
+        df_filtrado = aplicar_filtros(
+            df, SETOR=setor_selecionado, ANO=ano_selecionado, MES=mes_selecionado)
 
-        if setor_selecionado != "Todos":
-            df_filtrado = df_filtrado[df_filtrado["SETOR"]
-                                      == setor_selecionado]
+        if df_filtrado.empty:
+            st.info("Nenhum dado para os filtros selecionados.")
+        else:
+            # Agregações em cache, chaveadas pelos filtros selecionados
+            g_setor, g_data_setor, g_mes = agregar_tempo(
+                setor_selecionado, ano_selecionado, mes_selecionado)
+
+            # Métricas principais (total e setores saem da agregação por setor)
+            col1, col2, col3, col4 = st.columns(4)
+
+            with col1:
+                total_atendimentos = g_setor["QUANTIDADE"].sum()
+                st.metric("Total de Atendimentos",
+                          f"{format_brl(total_atendimentos)}")
+
+            with col2:
+                tempo_medio_geral = df_filtrado["TEMPO_MINUTOS"].mean()
+                st.metric("Tempo Médio de Espera", f"{tempo_medio_geral:.1f} min")
+
+            with col3:
+                setores_unicos = len(g_setor)
+                st.metric("Setores Ativos", setores_unicos)
+
+            with col4:
+                linha_max = df_filtrado.iloc[df_filtrado["QUANTIDADE"].to_numpy().argmax()]
+                maior_fila = linha_max["QUANTIDADE"]
+                setor_maior = linha_max["SETOR"]
+                ano_maior = linha_max["ANO"]
+                mes_maior = linha_max["MES"]
+                st.metric(
+                    "Maior Fila",
+                    f"{format_brl(maior_fila)}",
+                    f"{setor_maior} / {str(mes_maior).zfill(2)}/{ano_maior}"
+                )
 
-        if ano_selecionado != "Todos":
-            df_filtrado = df_filtrado[df_filtrado["ANO"] == ano_selecionado]
+            st.markdown("---")
 
-        if mes_selecionado != "Todos":
-            df_filtrado = df_filtrado[df_filtrado["MES"] == mes_selecionado]
+            # Gráficos principais
+            col1, col2 = st.columns(2)
 
-        # Métricas principais
-        col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.subheader("📈 Quantidade de Atendimentos por Setor")
 
-        with col1:
-            total_atendimentos = df_filtrado["QUANTIDADE"].sum()
-            st.metric("Total de Atendimentos",
-                      f"{format_brl(total_atendimentos)}")
+                # Agrupar por setor
+                df_setor = g_setor["QUANTIDADE"].sort_values().tail(
+                    LIMITE_BARRAS).reset_index()
 
-        with col2:
-            tempo_medio_geral = df_filtrado["TEMPO_MINUTOS"].mean()
-            st.metric("Tempo Médio de Espera", f"{tempo_medio_geral:.1f} min")
+                fig_setor = px.bar(
+                    df_setor,
+                    x="QUANTIDADE",
+                    y="SETOR",
+                    orientation="h",
+                    title="Atendimentos por Setor",
+                    color="QUANTIDADE",
+                    color_continuous_scale="Blues"
+                )
+                fig_setor.update_layout(height=400)
+                st.plotly_chart(fig_setor, use_container_width=True)
+
+            with col2:
+                st.subheader("⏰ Tempo Médio de Espera por Setor")
+
+                # Agrupar por setor para tempo médio
+                df_tempo_setor = g_setor["TEMPO_MINUTOS"].sort_values().tail(
+                    LIMITE_BARRAS).reset_index()
+
+                fig_tempo = px.bar(
+                    df_tempo_setor,
+                    x="TEMPO_MINUTOS",
+                    y="SETOR",
+                    orientation="h",
+                    title="Tempo Médio de Espera por Setor (minutos)",
+                    color="TEMPO_MINUTOS",
+                    color_continuous_scale="Reds"
+                )
+                fig_tempo.update_layout(height=400)
+                st.plotly_chart(fig_tempo, use_container_width=True)
 
-        with col3:
-            setores_unicos = df_filtrado["SETOR"].nunique()
-            st.metric("Setores Ativos", setores_unicos)
+            # Gráficos de evolução temporal
+            st.subheader("📅 Evolução Temporal")
 
-        with col4:
-            if not df_filtrado.empty:
-                idx_max = df_filtrado["QUANTIDADE"].idxmax()
-                maior_fila = df_filtrado.loc[idx_max, "QUANTIDADE"]
-                setor_maior = df_filtrado.loc[idx_max, "SETOR"]
-                ano_maior = df_filtrado.loc[idx_max, "ANO"]
-                mes_maior = df_filtrado.loc[idx_max, "MES"]
-                st.metric(
-                    "Maior Fila",
-                    f"{format_brl(maior_fila)}",
-                    f"{setor_maior} / {str(mes_maior).zfill(2)}/{ano_maior}"
-                )
-            else:
-                st.metric("Maior Fila", "0")
+            col1, col2 = st.columns(2)
 
-        st.markdown("---")
+            with col1:
+                st.subheader("Atendimentos por Mês")
 
-        # Gráficos principais
-        col1, col2 = st.columns(2)
+                df_mensal = g_data_setor[["DATA", "SETOR", "QUANTIDADE"]]
 
-        with col1:
-            st.subheader("📈 Quantidade de Atendimentos por Setor")
+                fig_mensal = px.line(
+                    df_mensal,
+                    x="DATA",
+                    y="QUANTIDADE",
+                    color="SETOR",
+                    title="Evolução Mensal de Atendimentos",
+                    markers=True,
+                    render_mode="webgl"
+                )
+                fig_mensal.update_layout(height=400, uirevision="stable")
+                st.plotly_chart(fig_mensal, use_container_width=True)
+
+            with col2:
+                st.subheader("Tempo de Espera por Mês")
+
+                df_tempo_mensal = g_data_setor[["DATA", "SETOR", "TEMPO_MINUTOS"]]
+
+                fig_tempo_mensal = px.line(
+                    df_tempo_mensal,
+                    x="DATA",
+                    y="TEMPO_MINUTOS",
+                    color="SETOR",
+                    title="Evolução Mensal do Tempo de Espera",
+                    markers=True,
+                    render_mode="webgl"
+                )
+                fig_tempo_mensal.update_layout(height=400, uirevision="stable")
+                st.plotly_chart(fig_tempo_mensal, use_container_width=True)
 
-            # Agrupar por setor
-            df_setor = df_filtrado.groupby("SETOR").agg({
-                "QUANTIDADE": "sum"
-            }).reset_index().sort_values("QUANTIDADE", ascending=True)
+            # Gráfico de correlação
+            st.subheader("🔗 Correlação: Quantidade vs Tempo de Espera")
 
-            fig_setor = px.bar(
-                df_setor,
+            fig_scatter = px.scatter(
+                df_filtrado,
                 x="QUANTIDADE",
-                y="SETOR",
-                orientation="h",
-                title="Atendimentos por Setor",
-                color="QUANTIDADE",
-                color_continuous_scale="Blues"
+                y="TEMPO_MINUTOS",
+                color="SETOR",
+                size="QUANTIDADE",
+                hover_data=["ANO", "MES"],
+                title="Relação entre Quantidade de Atendimentos e Tempo de Espera",
+                render_mode="webgl"
             )
-            fig_setor.update_layout(height=400)
-            st.plotly_chart(fig_setor, use_container_width=True)
-
-        with col2:
-            st.subheader("⏰ Tempo Médio de Espera por Setor")
-
-            # Agrupar por setor para tempo médio
-            df_tempo_setor = df_filtrado.groupby("SETOR").agg({
-                "TEMPO_MINUTOS": "mean"
-            }).reset_index().sort_values("TEMPO_MINUTOS", ascending=True)
-
-            fig_tempo = px.bar(
-                df_tempo_setor,
-                x="TEMPO_MINUTOS",
-                y="SETOR",
-                orientation="h",
-                title="Tempo Médio de Espera por Setor (minutos)",
-                color="TEMPO_MINUTOS",
-                color_continuous_scale="Reds"
+            fig_scatter.update_layout(height=500, uirevision="stable")
+            st.plotly_chart(fig_scatter, use_container_width=True)
+
+            # Tabela de dados
+            st.subheader("📋 Dados Detalhados")
+
+            # Preparar dados para exibição (apenas as primeiras linhas vão para a tela)
+            total_linhas = len(df_filtrado)
+            df_display = tabela_tempo(df_filtrado.head(LIMITE_LINHAS))
+
+            if total_linhas > LIMITE_LINHAS:
+                st.caption(
+                    f"Mostrando {format_brl(LIMITE_LINHAS)} de {format_brl(total_linhas)} linhas")
+
+            st.dataframe(
+                style_brl(df_display, subset=["QUANTIDADE"]),
+                use_container_width=True,
+                hide_index=True
             )
-            fig_tempo.update_layout(height=400)
-            st.plotly_chart(fig_tempo, use_container_width=True)
 
-        # Gráficos de evolução temporal
-        st.subheader("📅 Evolução Temporal")
+            st.download_button(
+                "Baixar CSV completo",
+                data=csv_tempo(setor_selecionado, ano_selecionado, mes_selecionado),
+                file_name="tempo_atendimentos.csv",
+                mime="text/csv",
+                key="csv_tempo"
+            )
 
-        col1, col2 = st.columns(2)
+            # Estatísticas resumidas
+            st.subheader("📊 Estatísticas Resumidas")
 
-        with col1:
-            st.subheader("Atendimentos por Mês")
+            col1, col2 = st.columns(2)
 
-            # Criar coluna de data para melhor visualização
-            df_filtrado["DATA"] = df_filtrado["ANO"].astype(
-                str) + "-" + df_filtrado["MES"].astype(str).str.zfill(2)
+            with col1:
+                st.write("**Por Setor:**")
+                stats_setor = g_setor[[
+                    "QUANTIDADE", "QTD_MEAN", "QTD_MAX",
+                    "TEMPO_MINUTOS", "T_MAX", "T_MIN"
+                ]].sort_index().round(2)
 
-            df_mensal = df_filtrado.groupby(["DATA", "SETOR"]).agg({
-                "QUANTIDADE": "sum"
-            }).reset_index()
+                # Renomear colunas para melhor legibilidade
+                stats_setor.columns = [
+                    "Total Atend.", "Média Atend.", "Máx Atend.",
+                    "Tempo Médio (min)", "Tempo Máx (min)", "Tempo Mín (min)"
+                ]
 
-            fig_mensal = px.line(
-                df_mensal,
-                x="DATA",
-                y="QUANTIDADE",
-                color="SETOR",
-                title="Evolução Mensal de Atendimentos",
-                markers=True
-            )
-            fig_mensal.update_layout(height=400)
-            st.plotly_chart(fig_mensal, use_container_width=True)
+                # Formatar os números para padrão brasileiro nas colunas numéricas
+                st.dataframe(style_brl(stats_setor), use_container_width=True)
 
-        with col2:
-            st.subheader("Tempo de Espera por Mês")
+            with col2:
+                st.write("**Por Mês:**")
+                stats_mes = g_mes.round(2)
 
-            df_tempo_mensal = df_filtrado.groupby(["DATA", "SETOR"]).agg({
-                "TEMPO_MINUTOS": "mean"
-            }).reset_index()
+                stats_mes.columns = ["Total Atend.",
+                                     "Média Atend.", "Tempo Médio (min)"]
 
-            fig_tempo_mensal = px.line(
-                df_tempo_mensal,
-                x="DATA",
-                y="TEMPO_MINUTOS",
-                color="SETOR",
-                title="Evolução Mensal do Tempo de Espera",
-                markers=True
-            )
-            fig_tempo_mensal.update_layout(height=400)
-            st.plotly_chart(fig_tempo_mensal, use_container_width=True)
-
-        # Gráfico de correlação
-        st.subheader("🔗 Correlação: Quantidade vs Tempo de Espera")
-
-        fig_scatter = px.scatter(
-            df_filtrado,
-            x="QUANTIDADE",
-            y="TEMPO_MINUTOS",
-            color="SETOR",
-            size="QUANTIDADE",
-            hover_data=["ANO", "MES"],
-            title="Relação entre Quantidade de Atendimentos e Tempo de Espera"
-        )
-        fig_scatter.update_layout(height=500)
-        st.plotly_chart(fig_scatter, use_container_width=True)
-
-        # Tabela de dados
-        st.subheader("📋 Dados Detalhados")
-
-        # Preparar dados para exibição
-        df_display = df_filtrado.copy()
-        df_display["TEMPO_MEDIO_ESPERA_MIN"] = df_display["TEMPO_MINUTOS"].apply(
-            lambda x: f"{int(x//60):02d}:{int(x%60):02d}")
-
-        # Selecionar colunas para exibição
-        colunas_display = ["CODIGO", "SETOR", "ANO", "MES",
-                           "QUANTIDADE", "TEMPO_MEDIO_ESPERA", "TEMPO_MEDIO_ESPERA_MIN"]
-        df_display = df_display[colunas_display]
-
-        # Formatação nas colunas dos dataframes
-        if "QUANTIDADE" in df_display.columns:
-            df_display["QUANTIDADE"] = df_display["QUANTIDADE"].apply(
-                lambda x: format_brl(x))
-            df_display["ANO"] = df_display["ANO"].astype(str)
-
-        # Formatação nas colunas dos dataframes
-        if "ANO" in df_filtrado.columns:
-            df_filtrado["ANO"] = df_filtrado["ANO"].astype(str)
-
-        st.dataframe(
-            df_display,
-            use_container_width=True,
-            hide_index=True
-        )
-
-        # Estatísticas resumidas
-        st.subheader("📊 Estatísticas Resumidas")
-
-        col1, col2 = st.columns(2)
-
-        with col1:
-            st.write("**Por Setor:**")
-            stats_setor = df_filtrado.groupby("SETOR").agg({
-                "QUANTIDADE": ["sum", "mean", "max"],
-                "TEMPO_MINUTOS": ["mean", "max", "min"]
-            }).round(2)
-
-            # Renomear colunas para melhor legibilidade
-            stats_setor.columns = [
-                "Total Atend.", "Média Atend.", "Máx Atend.",
-                "Tempo Médio (min)", "Tempo Máx (min)", "Tempo Mín (min)"
-            ]
-
-            # Formatar os números para padrão brasileiro nas colunas numéricas
-            for col in stats_setor.columns:
-                stats_setor[col] = stats_setor[col].apply(
-                    lambda x: format_brl(x, 0))
-
-            st.dataframe(stats_setor, use_container_width=True)
-
-        with col2:
-            st.write("**Por Mês:**")
-            stats_mes = df_filtrado.groupby(["ANO", "MES"]).agg({
-                "QUANTIDADE": ["sum", "mean"],
-                "TEMPO_MINUTOS": ["mean"]
-            }).round(2)
-
-            stats_mes.columns = ["Total Atend.",
-                                 "Média Atend.", "Tempo Médio (min)"]
-
-            # Formatar os números para padrão brasileiro nas colunas numéricas
-            for col in stats_mes.columns:
-                stats_mes[col] = stats_mes[col].apply(
-                    lambda x: format_brl(x, 0))
-
-            st.dataframe(stats_mes, use_container_width=True)
+                # Formatar os números para padrão brasileiro nas colunas numéricas
+                st.dataframe(style_brl(stats_mes), use_container_width=True)
 
     except FileNotFoundError:
         st.error("❌ Arquivo 'Tempo_Atendimentos.xlsx' não encontrado.")
@@ -352,7 +576,7 @@ with tab1:
 # === ABA 2: QUANTIDADE DE ATENDIMENTOS ===
 with tab2:
     # Carregar dados de atendimentos
-    df_atendimentos = load_atendimentos_data("Atendimentos.xlsx")
+    df_atendimentos = base_atendimentos()
 
     if not df_atendimentos.empty:
         # Sidebar para filtros da aba de atendimentos
@@ -383,208 +607,182 @@ with tab2:
             "Selecione o Mês:", meses_atend, key="mes_atend")
 
         # Aplicar filtros
-        df_atend_filtrado = df_atendimentos.copy()
-
-        if setor_atend != "Todos":
-            df_atend_filtrado = df_atend_filtrado[df_atend_filtrado["SETOR"] == setor_atend]
-
-        if tipo_atend != "Todos":
-            df_atend_filtrado = df_atend_filtrado[df_atend_filtrado["TIPO"] == tipo_atend]
+        df_atend_filtrado = aplicar_filtros(
+            df_atendimentos, SETOR=setor_atend, TIPO=tipo_atend, ANO=ano_atend, MES=mes_atend)
 
-        if ano_atend != "Todos":
-            df_atend_filtrado = df_atend_filtrado[df_atend_filtrado["ANO"] == ano_atend]
-
-        if mes_atend != "Todos":
-            df_atend_filtrado = df_atend_filtrado[df_atend_filtrado["MES"] == mes_atend]
+        if df_atend_filtrado.empty:
+            st.info("Nenhum dado para os filtros selecionados.")
+        else:
+            # Agregações em cache, chaveadas pelos filtros selecionados
+            (g_setor_atend, g_tipo_atend, g_setor_mes,
+             g_data_tipo, g_setor_tipo) = agregar_atendimentos(
+                setor_atend, tipo_atend, ano_atend, mes_atend)
 
-        # Métricas principais
-        col1, col2, col3, col4 = st.columns(4)
+            # Métricas principais
+            col1, col2, col3, col4 = st.columns(4)
 
-        with col1:
-            total_qtde = df_atend_filtrado["QTDE"].sum()
-            st.metric("Total de Atendimentos", f"{format_brl(total_qtde)}")
+            with col1:
+                total_qtde = df_atend_filtrado["QTDE"].sum()
+                st.metric("Total de Atendimentos", f"{format_brl(total_qtde)}")
 
-        with col2:
-            media_qtde = df_atend_filtrado["QTDE"].mean()
-            st.metric("Média de Atendimentos", f"{format_brl(media_qtde)}")
+            with col2:
+                media_qtde = df_atend_filtrado["QTDE"].mean()
+                st.metric("Média de Atendimentos", f"{format_brl(media_qtde)}")
 
-        with col3:
-            setores_ativos = df_atend_filtrado["SETOR"].nunique()
-            st.metric("Setores Ativos", setores_ativos)
+            with col3:
+                setores_ativos = df_atend_filtrado["SETOR"].nunique()
+                st.metric("Setores Ativos", setores_ativos)
 
-        with col4:
-            # Agrupa por SETOR, ANO, MES (ou só SETOR, ajuste conforme sua lógica)
-            df_group = df_atend_filtrado.groupby(["SETOR", "ANO", "MES"], as_index=False)["QTDE"].sum()
-            max_qtde = df_group["QTDE"].max() if not df_group.empty else 0
-            if not df_group.empty:
+            with col4:
+                # Agrupa por SETOR, ANO, MES (ou só SETOR, ajuste conforme sua lógica)
+                df_group = g_setor_mes
                 idx_max = df_group["QTDE"].idxmax()
+                max_qtde = df_group.loc[idx_max, "QTDE"]
                 setor_max = df_group.loc[idx_max, "SETOR"]
                 ano_max = df_group.loc[idx_max, "ANO"]
                 mes_max = df_group.loc[idx_max, "MES"]
                 st.metric("Maior Quantidade", f"{format_brl(max_qtde)}", f"{setor_max} / {mes_max}/{ano_max}")
-            else:
-                st.metric("Maior Quantidade", "0")
-
-        st.markdown("---")
-
-        # Gráficos principais
-        col1, col2 = st.columns(2)
-
-        with col1:
-            st.subheader("📊 Quantidade por Setor")
-
-            # Agrupar por setor
-            df_setor_qtde = df_atend_filtrado.groupby("SETOR").agg({
-                "QTDE": "sum"
-            }).reset_index().sort_values("QTDE", ascending=True)
-
-            fig_setor_qtde = px.bar(
-                df_setor_qtde,
-                x="QTDE",
-                y="SETOR",
-                orientation="h",
-                title="Total de Atendimentos por Setor",
-                color="QTDE",
-                color_continuous_scale="Viridis"
-            )
-            fig_setor_qtde.update_layout(height=400)
-            st.plotly_chart(fig_setor_qtde, use_container_width=True)
-
-        with col2:
-            st.subheader("🎯 Distribuição por Tipo")
-
-            # Gráfico de pizza por tipo
-            df_tipo = df_atend_filtrado.groupby("TIPO").agg({
-                "QTDE": "sum"
-            }).reset_index()
-
-            fig_tipo = px.pie(
-                df_tipo,
-                values="QTDE",
-                names="TIPO",
-                title="Distribuição por Tipo de Atendimento"
-            )
-            fig_tipo.update_layout(height=400)
-            st.plotly_chart(fig_tipo, use_container_width=True)
 
-        # Gráficos de evolução temporal
-        st.subheader("📅 Evolução Temporal dos Atendimentos")
+            st.markdown("---")
+
+            # Gráficos principais
+            col1, col2 = st.columns(2)
+
+            with col1:
+                st.subheader("📊 Quantidade por Setor")
+
+                # Agrupar por setor
+                df_setor_qtde = g_setor_atend["sum"].rename("QTDE").sort_values().tail(
+                    LIMITE_BARRAS).reset_index()
 
-        col1, col2 = st.columns(2)
+                fig_setor_qtde = px.bar(
+                    df_setor_qtde,
+                    x="QTDE",
+                    y="SETOR",
+                    orientation="h",
+                    title="Total de Atendimentos por Setor",
+                    color="QTDE",
+                    color_continuous_scale="Viridis"
+                )
+                fig_setor_qtde.update_layout(height=400)
+                st.plotly_chart(fig_setor_qtde, use_container_width=True)
+
+            with col2:
+                st.subheader("🎯 Distribuição por Tipo")
 
-        with col1:
-            st.subheader("Evolução Mensal")
+                # Gráfico de pizza por tipo
+                df_tipo = g_tipo_atend["sum"].rename("QTDE").reset_index()
+
+                fig_tipo = px.pie(
+                    df_tipo,
+                    values="QTDE",
+                    names="TIPO",
+                    title="Distribuição por Tipo de Atendimento"
+                )
+                fig_tipo.update_layout(height=400)
+                st.plotly_chart(fig_tipo, use_container_width=True)
+
+            # Gráficos de evolução temporal
+            st.subheader("📅 Evolução Temporal dos Atendimentos")
+
+            col1, col2 = st.columns(2)
+
+            with col1:
+                st.subheader("Evolução Mensal")
+
+                df_mensal_atend = g_data_tipo
+
+                fig_mensal_atend = px.line(
+                    df_mensal_atend,
+                    x="DATA",
+                    y="QTDE",
+                    color="TIPO",
+                    title="Evolução Mensal por Tipo",
+                    markers=True,
+                    render_mode="webgl"
+                )
+                fig_mensal_atend.update_layout(height=400, uirevision="stable")
+                st.plotly_chart(fig_mensal_atend, use_container_width=True)
+
+            with col2:
+                st.subheader("Comparação por Setor e Tipo")
+
+                # Gráfico de barras agrupadas
+                df_setor_tipo = g_setor_tipo
+
+                fig_setor_tipo = px.bar(
+                    df_setor_tipo,
+                    x="SETOR",
+                    y="QTDE",
+                    color="TIPO",
+                    title="Atendimentos por Setor e Tipo",
+                    barmode="group"
+                )
+                fig_setor_tipo.update_layout(height=400, xaxis_tickangle=-45)
+                st.plotly_chart(fig_setor_tipo, use_container_width=True)
 
-            # Criar coluna de data
-            df_atend_filtrado["DATA"] = df_atend_filtrado["ANO"].astype(
-                str) + "-" + df_atend_filtrado["MES"].astype(str).str.zfill(2)
+            # Heatmap
+            st.subheader("🔥 Mapa de Calor: Setor vs Mês")
 
-            df_mensal_atend = df_atend_filtrado.groupby(["DATA", "TIPO"]).agg({
-                "QTDE": "sum"
-            }).reset_index()
+            df_heatmap = montar_heatmap(setor_atend, tipo_atend, ano_atend, mes_atend)
 
-            fig_mensal_atend = px.line(
-                df_mensal_atend,
-                x="DATA",
-                y="QTDE",
-                color="TIPO",
-                title="Evolução Mensal por Tipo",
-                markers=True
+            fig_heatmap = px.imshow(
+                df_heatmap,
+                title="Quantidade de Atendimentos por Setor e Mês",
+                color_continuous_scale="Blues",
+                aspect="auto"
             )
-            fig_mensal_atend.update_layout(height=400)
-            st.plotly_chart(fig_mensal_atend, use_container_width=True)
-
-        with col2:
-            st.subheader("Comparação por Setor e Tipo")
-
-            # Gráfico de barras agrupadas
-            df_setor_tipo = df_atend_filtrado.groupby(["SETOR", "TIPO"]).agg({
-                "QTDE": "sum"
-            }).reset_index()
-
-            fig_setor_tipo = px.bar(
-                df_setor_tipo,
-                x="SETOR",
-                y="QTDE",
-                color="TIPO",
-                title="Atendimentos por Setor e Tipo",
-                barmode="group"
+            fig_heatmap.update_layout(height=500)
+            st.plotly_chart(fig_heatmap, use_container_width=True)
+
+            # Tabela de dados
+            st.subheader("📋 Dados Detalhados")
+
+            # Preparar dados para exibição (apenas as primeiras linhas vão para a tela)
+            total_linhas_atend = len(df_atend_filtrado)
+            df_display_atend = tabela_atendimentos(
+                df_atend_filtrado.head(LIMITE_LINHAS))
+
+            if total_linhas_atend > LIMITE_LINHAS:
+                st.caption(
+                    f"Mostrando {format_brl(LIMITE_LINHAS)} de {format_brl(total_linhas_atend)} linhas")
+
+            st.dataframe(
+                style_brl(df_display_atend, subset=["QTDE"]),
+                use_container_width=True,
+                hide_index=True
             )
-            fig_setor_tipo.update_layout(height=400, xaxis_tickangle=-45)
-            st.plotly_chart(fig_setor_tipo, use_container_width=True)
-
-        # Heatmap
-        st.subheader("🔥 Mapa de Calor: Setor vs Mês")
-
-        # Criar pivot table para heatmap
-        df_heatmap = df_atend_filtrado.pivot_table(
-            values="QTDE",
-            index="SETOR",
-            columns="MES",
-            aggfunc="sum",
-            fill_value=0
-        )
-
-        fig_heatmap = px.imshow(
-            df_heatmap,
-            title="Quantidade de Atendimentos por Setor e Mês",
-            color_continuous_scale="Blues",
-            aspect="auto"
-        )
-        fig_heatmap.update_layout(height=500)
-        st.plotly_chart(fig_heatmap, use_container_width=True)
-
-        # Tabela de dados
-        st.subheader("📋 Dados Detalhados")
-
-        # Preparar dados para exibição
-        df_display_atend = df_atend_filtrado.copy()
-
-        if "QTDE" in df_display_atend.columns:
-            df_display_atend["QTDE"] = df_display_atend["QTDE"].apply(
-                lambda x: format_brl(x))
-            df_display_atend["ANO"] = df_display_atend["ANO"].astype(str)
-
-        st.dataframe(
-            df_display_atend,
-            use_container_width=True,
-            hide_index=True
-        )
-
-        # Estatísticas resumidas
-        st.subheader("📊 Estatísticas Resumidas")
-
-        col1, col2 = st.columns(2)
-
-        with col1:
-            st.write("**Por Setor:**")
-            stats_setor_atend = df_atend_filtrado.groupby("SETOR").agg({
-                "QTDE": ["sum", "mean", "max", "min"]
-            }).round(2)
-
-            stats_setor_atend.columns = ["Total", "Média", "Máximo", "Mínimo"]
-
-            # Formatar os números para padrão brasileiro nas colunas numéricas
-            for col in stats_setor_atend.columns:
-                stats_setor_atend[col] = stats_setor_atend[col].apply(
-                    lambda x: format_brl(x, 0))
-
-            st.dataframe(stats_setor_atend, use_container_width=True)
-
-        with col2:
-            st.write("**Por Tipo:**")
-            stats_tipo_atend = df_atend_filtrado.groupby("TIPO").agg({
-                "QTDE": ["sum", "mean", "max", "min"]
-            }).round(2)
-
-            stats_tipo_atend.columns = ["Total", "Média", "Máximo", "Mínimo"]
-
-            # Formatar os números para padrão brasileiro nas colunas numéricas
-            for col in stats_tipo_atend.columns:
-                stats_tipo_atend[col] = stats_tipo_atend[col].apply(
-                    lambda x: format_brl(x, 0))
-
-            st.dataframe(stats_tipo_atend, use_container_width=True)
+
+            st.download_button(
+                "Baixar CSV completo",
+                data=csv_atendimentos(setor_atend, tipo_atend, ano_atend, mes_atend),
+                file_name="atendimentos.csv",
+                mime="text/csv",
+                key="csv_atend"
+            )
+
+            # Estatísticas resumidas
+            st.subheader("📊 Estatísticas Resumidas")
+
+            col1, col2 = st.columns(2)
+
+            with col1:
+                st.write("**Por Setor:**")
+                stats_setor_atend = g_setor_atend.round(2)
+
+                stats_setor_atend.columns = ["Total", "Média", "Máximo", "Mínimo"]
+
+                # Formatar os números para padrão brasileiro nas colunas numéricas
+                st.dataframe(style_brl(stats_setor_atend), use_container_width=True)
+
+            with col2:
+                st.write("**Por Tipo:**")
+                stats_tipo_atend = g_tipo_atend.round(2)
+
+                stats_tipo_atend.columns = ["Total", "Média", "Máximo", "Mínimo"]
+
+                # Formatar os números para padrão brasileiro nas colunas numéricas
+                st.dataframe(style_brl(stats_tipo_atend), use_container_width=True)
 
     else:
         st.error("❌ Não foi possível carregar os dados de atendimentos.")